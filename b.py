@@ -1,30 +1,23 @@
 import dspy
-import logging
-import random
+import atexit
+import os
+import runlog
 from dspy import InputField, OutputField, Signature
 from problem import Problem
 from vor import Desc2PlanGenerator, UpdatePlan, Reason2CodeGenerator, Pseudo2GuidelineGenerator, SummarizeGuideline, Plan2TimeComplexityGuidelineGenerator, Plan2AlternativeSolutionsGenerator, Plan2PseudoCodeGenerator, Plan2MistakesGenerator, Plan2InvariantsGenerator, ExpandDesc
 from vor2 import ReviseCode
-# Configure logging with random colors
-def get_random_color():
-    return random.choice(['\033[91m', '\033[92m', '\033[93m', '\033[94m', '\033[95m', '\033[96m'])
-
-class ColoredFormatter(logging.Formatter):
-    def format(self, record):
-        color = get_random_color()
-        reset = '\033[0m'
-        return f"{color}{super().format(record)}{reset}"
-
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-handler = logging.StreamHandler()
-handler.setFormatter(ColoredFormatter('%(asctime)s - %(levelname)s - Line %(lineno)d: %(message)s'))
-logger.addHandler(handler)
+from routing import Router
+import lmclient
+import complexity
+from dedup import MAX_TEMPERATURE, SimilarityIndex
+from solved_store import SolvedStore
+from batching import expanded_path
+logger = runlog.setup(__name__)
 
 def extract_code(response: str) -> str:
     # extract all text between <code> and </code> tags
     # there might be multiple code blocks, return the first one
-    logger.info(f"Extracting code from response: {response}")
+    runlog.event(logger, "extract_code", response=response)
     import re
     code_blocks = re.findall(r'<code>(.*?)</code>', response, re.DOTALL)
     out =  code_blocks[-1] if code_blocks else ""
@@ -33,6 +26,20 @@ def extract_code(response: str) -> str:
         out = code_blocks[-1] if code_blocks else ""
     return out
 
+def generate_plan(desc2pseudo, plans, plan, temperature, iteration, **kwargs):
+    '''
+    returns (plan, temperature). A near-duplicate of an earlier plan is dropped in favour of the
+    current one, as in c.py, and the next plans are generated hotter.
+    '''
+    with runlog.timed(logger, "desc2plan", iteration=iteration, temperature=temperature) as fields:
+        new_plan = desc2pseudo(config={"temperature": temperature}, **kwargs).plan
+        _, similarity = plans.nearest(new_plan)
+        fields.update(plan=new_plan, similarity=round(similarity, 3))
+    if similarity >= plans.threshold:
+        return plan, min(MAX_TEMPERATURE, temperature + 0.2)
+    plans.add(new_plan)
+    return new_plan, temperature
+
 """You are an expert problem solver. Your task is creating the code to solve the problem at hand in cpp.
     You are given a problem description and a sample input/output pair.
     Write code as if you are giving a coding interview and any edge cases missed will get you a rejection.
@@ -114,6 +121,8 @@ if __name__ == "__main__":
         sample_in_file=f"Hacker cup/{problem_name}/sample_in.txt", 
         sample_out_file=f"Hacker cup/{problem_name}/sample_out.txt"
     )
+    # compiled candidates live in a private build dir, remove it however the run ends
+    atexit.register(problem.cleanup)
 
     lm = dspy.Together(
         # model="meta-llama/Llama-3-70b-chat-hf", # Note: didn't find much a difference btwn mini & full gpt-4o
@@ -123,111 +132,146 @@ if __name__ == "__main__":
         # stop='hi',
     )
 
+    lmclient.install(lm)
     dspy.settings.configure(lm=lm)
     dspy.configure(experimental=True)
+    router = Router()
+    atexit.register(lambda: print(router.report()))
+    # connection pool / rate limit counters of the endpoint shared by all routed LMs
+    atexit.register(lambda: print(lmclient.shared_session().snapshot()))
 
-    desc2pseudo = Desc2PlanGenerator()
+    desc2pseudo = router.install(Desc2PlanGenerator())
     logger.info("Evaluating Simple Program on test...")
-    guidelines = ""
-    expand_desc = ExpandDesc()
-    expanded_desc = str(expand_desc(desc=problem.desc).expanded_desc)
-    logger.info(f"Expanded description: {expanded_desc}")
-    response = desc2pseudo(
-        problem_description=expanded_desc, 
-        guidelines=guidelines
-    )
-    logger.info(f"Initial response: {response}")
-    time_complexity_analyzer = Plan2TimeComplexityGuidelineGenerator(desc=problem.desc)
-    alternative_solutions_generator = Plan2AlternativeSolutionsGenerator(desc=problem.desc)
-    mistakes_generator = Plan2MistakesGenerator(desc=problem.desc.split("Constraints")[0])
-    update_plan = UpdatePlan(desc=problem.desc)
-    plan2invariants_generator = Plan2InvariantsGenerator(desc=problem.desc.split("Constraints")[0])
+    # warm start from related problems solved in earlier runs
+    store = SolvedStore()
+    guidelines = store.guidelines(problem.desc, exclude=problem_name)
+    runlog.event(logger, "retrieved_guidelines", guidelines=guidelines)
+    # `python batching.py` expands all statements concurrently ahead of time
+    if os.path.exists(expanded_path(problem_name)):
+        with open(expanded_path(problem_name), "r") as f:
+            expanded_desc = f.read()
+        runlog.event(logger, "expand_desc", cached=True, expanded_desc=expanded_desc)
+    else:
+        expand_desc = router.install(ExpandDesc())
+        with runlog.timed(logger, "expand_desc") as fields:
+            expanded_desc = str(expand_desc(desc=problem.desc).expanded_desc)
+            fields["expanded_desc"] = expanded_desc
+    with runlog.timed(logger, "desc2plan") as fields:
+        response = desc2pseudo(
+            problem_description=expanded_desc, 
+            guidelines=guidelines
+        )
+        fields["plan"] = response.plan
+    time_complexity_analyzer = router.install(Plan2TimeComplexityGuidelineGenerator(desc=problem.desc))
+    alternative_solutions_generator = router.install(Plan2AlternativeSolutionsGenerator(desc=problem.desc))
+    mistakes_generator = router.install(Plan2MistakesGenerator(desc=problem.desc.split("Constraints")[0]))
+    update_plan = router.install(UpdatePlan(desc=problem.desc))
+    plan2invariants_generator = router.install(Plan2InvariantsGenerator(desc=problem.desc.split("Constraints")[0]))
     plan = response.plan
+    # plans of this run, a guideline that leaves the plan unchanged makes the next ones run hotter
+    plans = SimilarityIndex(threshold=0.9)
+    plans.add(plan)
+    plan_temperature = lm.kwargs["temperature"]
     p_guidelines = guidelines
-    summarized_guidelines = SummarizeGuideline()
+    summarized_guidelines = router.install(SummarizeGuideline())
     for i in range(1):
         # for stmt in problem.desc.split("Constraints")[0].split("."):
         time_complexity_response = time_complexity_analyzer(
             plan=plan,
         )
         guidelines = p_guidelines + str(time_complexity_response.time_complexity_guideline) + "\n"
-        response = desc2pseudo(
-            problem_description=expanded_desc, 
-            guidelines=guidelines
-        )
-        logger.info(f"Iteration {i+1} response plan: {response.plan}")
-        plan = response.plan
+        plan, plan_temperature = generate_plan(desc2pseudo, plans, plan, plan_temperature,
+            iteration=i+1, problem_description=expanded_desc, guidelines=guidelines)
         alternative_solutions_response = alternative_solutions_generator(
             plan=plan,
             previous_guidelines=guidelines
         )
         guidelines = p_guidelines + str(alternative_solutions_response.alternative_solutions) + "\n"
-        response = desc2pseudo(
-            problem_description=expanded_desc, 
-            guidelines=guidelines
-        )
-        logger.info(f"Iteration {i+1} response plan: {response.plan}")
-        plan = response.plan
+        plan, plan_temperature = generate_plan(desc2pseudo, plans, plan, plan_temperature,
+            iteration=i+1, problem_description=expanded_desc, guidelines=guidelines)
         mistakes_response = mistakes_generator(
             plan=plan,
             previous_guidelines=guidelines
         )
         guidelines = p_guidelines + str(mistakes_response.mistakes) + "\n"
-        logger.info(f"Iteration {i+1} guidelines: {guidelines}")
-        response = desc2pseudo(
-            problem_description=expanded_desc, 
-            guidelines=guidelines
-        )
-        logger.info(f"Iteration {i+1} response plan: {response.plan}")
-        plan = response.plan
+        runlog.event(logger, "mistakes_guideline", iteration=i+1, guidelines=guidelines)
+        plan, plan_temperature = generate_plan(desc2pseudo, plans, plan, plan_temperature,
+            iteration=i+1, problem_description=expanded_desc, guidelines=guidelines)
         invariants_response = plan2invariants_generator(
             plan=plan,
         )
         guidelines = p_guidelines + str(invariants_response.invariants_and_monovariants_guideline) + "\n"
-        logger.info(f"Iteration {i+1} invariants and monovariants guidelines: {guidelines}")
-        response = desc2pseudo(
-            problem_description=expanded_desc, 
-            guidelines=guidelines
-        )
-        logger.info(f"Iteration {i+1} response plan: {response.plan}")
-        plan = response.plan
+        runlog.event(logger, "invariants_guideline", iteration=i+1, guidelines=guidelines)
+        plan, plan_temperature = generate_plan(desc2pseudo, plans, plan, plan_temperature,
+            iteration=i+1, problem_description=expanded_desc, guidelines=guidelines)
         # print(stmt)
         # up_response = update_plan(
         #     statement=stmt,
         #     plan=plan,
         # )
         # plan = up_response.improved_plan
-        logger.info(f"Iteration {i+1} updated plan: {plan}")
+        runlog.event(logger, "updated_plan", iteration=i+1, plan=plan)
         p_guidelines = str(summarized_guidelines(guidelines).summarized_guidelines)
 
-        logger.info(f"Final plan: {plan}")
-        plan2pseudo = Plan2PseudoCodeGenerator()
-        response = plan2pseudo(
-            plan=plan,
-            problem_description=problem.desc,
-        )
-        logger.info(f"Pseudo code: {response.pseudo_code}")
+        runlog.event(logger, "final_plan", plan=plan)
+        plan2pseudo = router.install(Plan2PseudoCodeGenerator())
+        with runlog.timed(logger, "plan2pseudo") as fields:
+            response = plan2pseudo(
+                plan=plan,
+                problem_description=problem.desc,
+            )
+            fields["pseudo_code"] = response.pseudo_code
+        # the store keeps the plan, the revise loop below works from the pseudo code
+        final_plan = plan
         plan = response.pseudo_code
-    reason2code = Reason2CodeGenerator()
-    response = reason2code(
-        pseudo_code=response.pseudo_code,    
-        input_ouput_format=problem.desc.split("Constraints")[1],
-    )
-    logger.info(f"Generated C++ program: {response.cpp_program}")
-    score, failed_testcases = problem.test_code(response.cpp_program)
-    logger.info(f"Test results - Score: {score}, Failed testcases: {failed_testcases}")
+    reason2code = router.install(Reason2CodeGenerator())
+    with runlog.timed(logger, "reason2code") as fields:
+        response = reason2code(
+            pseudo_code=response.pseudo_code,    
+            input_ouput_format=problem.desc.split("Constraints")[1],
+        )
+        fields["code"] = response.cpp_program
+    with runlog.timed(logger, "test_code") as fields:
+        score, failed_testcases = problem.test_code(response.cpp_program)
+        fields.update(score=score, failed=len(failed_testcases), failed_testcases=failed_testcases)
     code = response.cpp_program
-    revisecode = ReviseCode()
-    for _ in range(5):
-        code = revisecode(plan=plan,
-            broken_code=code,
-            error=failed_testcases,
-            input_output_format=problem.desc.split("Constraints")[1])
+    revisecode = router.install(ReviseCode(mode="diff"))
+    # programs already evaluated in this run -> the error that was fed back for them
+    codes = SimilarityIndex()
+    codes.add(code, failed_testcases)
+    temperature = lm.kwargs["temperature"]
+    for iteration in range(5):
+        with runlog.timed(logger, "revise_code") as fields:
+            code = revisecode(plan=plan,
+                broken_code=code,
+                error=failed_testcases,
+                input_output_format=problem.desc.split("Constraints")[1],
+                config={"temperature": temperature})
+            fields["code"] = code
         # print(code)
-        logger.info(f"Generated C++ program: {code}")
-        score, failed_testcases = problem.test_code(code)
+        entry = codes.find_exact(code)
+        if entry is not None:
+            # same program as before: skip compiling and testing it and retry hotter
+            failed_testcases = codes.payloads[entry]
+            temperature = min(MAX_TEMPERATURE, temperature + 0.2)
+            runlog.event(logger, "test_code", duplicate_of=entry, temperature=temperature)
+            continue
+        with runlog.timed(logger, "test_code") as fields:
+            score, failed_testcases = problem.test_code(code, fail_fast=True)
+            fields.update(score=score, failed=len(failed_testcases), failed_testcases=failed_testcases)
         guidelines = failed_testcases
-        logger.info(f"Test results - Score: {score}, Failed testcases: {failed_testcases}")
         if score == 1.0:
-            exit(0)
+            with runlog.timed(logger, "complexity") as fields:
+                measured = complexity.measure(problem, code, problem_name)
+                fields["measured"] = complexity.describe(measured)
+            if measured is None or (not measured["timed_out"] and measured["crashed_at"] is None and measured["projected_seconds"] <= complexity.TIME_LIMIT):
+                store.add(problem_name, problem.desc, final_plan, code, score, iterations=iteration + 1,
+                          seconds=sum(result["seconds"] for result in problem.last_results))
+                exit(0)
+            # correct on the samples but too slow for the full input
+            failed_testcases = str(time_complexity_analyzer(
+                plan=plan,
+                measured_complexity=complexity.describe(measured),
+            ).time_complexity_guideline)
+        codes.add(code, failed_testcases)
 
@@ -0,0 +1,168 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Collects concurrent predictions for the same signature for a short window and dispatches
+# them together: as one batched request if a batch function is registered for the key, else
+# as a bounded parallel fan-out. Every caller gets its own result back.
+
+
+def signature_key(module) -> str:
+    signature = getattr(module, "signature", None)
+    if signature is not None:
+        return getattr(signature, "__name__", type(module).__name__)
+    return type(module).__name__
+
+
+class Batcher:
+    def __init__(self, window: float = 0.05, max_batch: int = 8, max_workers: int = 4) -> None:
+        self.window = window
+        self.max_batch = max_batch
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.batch_fns = {}
+        self.pending = {}
+        self.timers = {}
+        self.lock = threading.Lock()
+
+    def register_batch(self, key: str, batch_fn):
+        '''
+        batch_fn(list of kwargs) -> list of results, in the same order
+        '''
+        self.batch_fns[key] = batch_fn
+
+    def submit(self, key: str, fn, **kwargs) -> Future:
+        future = Future()
+        with self.lock:
+            batch = self.pending.setdefault(key, [])
+            batch.append((fn, kwargs, future))
+            if len(batch) >= self.max_batch:
+                self._take(key)
+                flush = batch
+            else:
+                flush = None
+                if key not in self.timers:
+                    timer = threading.Timer(self.window, self._flush, args=(key,))
+                    timer.daemon = True
+                    self.timers[key] = timer
+                    timer.start()
+        if flush is not None:
+            self._dispatch(key, flush)
+        return future
+
+    def predict(self, module, **kwargs):
+        '''
+        blocking call of `module(**kwargs)` that is batched with concurrent calls of the same signature
+        '''
+        return self.submit(signature_key(module), module, **kwargs).result()
+
+    def map(self, module, kwargs_list: list) -> list:
+        futures = [self.submit(signature_key(module), module, **kwargs) for kwargs in kwargs_list]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        with self.lock:
+            keys = list(self.pending)
+        for key in keys:
+            self._flush(key)
+        self.executor.shutdown(wait=True)
+
+    def _take(self, key: str):
+        # caller holds self.lock
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        return self.pending.pop(key, [])
+
+    def _flush(self, key: str):
+        with self.lock:
+            batch = self._take(key)
+        if batch:
+            self._dispatch(key, batch)
+
+    def _dispatch(self, key: str, batch: list):
+        batch_fn = self.batch_fns.get(key)
+        if batch_fn is not None:
+            self.executor.submit(self._run_batch, batch_fn, batch)
+            return
+        for fn, kwargs, future in batch:
+            self.executor.submit(self._run_one, fn, kwargs, future)
+
+    @staticmethod
+    def _run_one(fn, kwargs, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(**kwargs))
+        except Exception as e:
+            future.set_exception(e)
+
+    @staticmethod
+    def _run_batch(batch_fn, batch):
+        batch = [(kwargs, future) for _, kwargs, future in batch if future.set_running_or_notify_cancel()]
+        futures = [future for _, future in batch]
+        try:
+            results = batch_fn([kwargs for kwargs, _ in batch])
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        results = list(results)
+        for future, result in zip(futures, results):
+            future.set_result(result)
+        if len(results) != len(futures):
+            # never leave a caller blocked on a result the batch function did not return
+            error = RuntimeError(f"batch function returned {len(results)} results for {len(futures)} inputs")
+            for future in futures[len(results):]:
+                future.set_exception(error)
+
+
+EXPANDED_DIR = "runs/expanded"
+
+
+def expanded_path(problem_name: str, out_dir: str = EXPANDED_DIR) -> str:
+    return os.path.join(out_dir, f"{problem_name}.txt")
+
+
+def expand_statements(root: str = "Hacker cup", out_dir: str = EXPANDED_DIR, batcher: Batcher = None) -> dict:
+    '''
+    run ExpandDesc over every statement under `root` concurrently and cache the results in `out_dir`,
+    where b.py picks them up instead of expanding its statement on the critical path
+    '''
+    from vor import ExpandDesc
+
+    names = sorted(name for name in os.listdir(root) if os.path.exists(os.path.join(root, name, "statement.txt")))
+    descs = []
+    for name in names:
+        with open(os.path.join(root, name, "statement.txt"), "r") as f:
+            descs.append(f.read())
+
+    own_batcher = batcher is None
+    batcher = batcher or Batcher(max_batch=len(names) or 1, max_workers=len(names) or 1)
+    try:
+        predictions = batcher.map(ExpandDesc(), [{"desc": desc} for desc in descs])
+    finally:
+        if own_batcher:
+            batcher.shutdown()
+
+    os.makedirs(out_dir, exist_ok=True)
+    expanded = {}
+    for name, prediction in zip(names, predictions):
+        expanded[name] = str(prediction.expanded_desc)
+        with open(expanded_path(name, out_dir), "w") as f:
+            f.write(expanded[name])
+    return expanded
+
+
+if __name__ == "__main__":
+    import time
+
+    import dspy
+    import lmclient
+
+    lm = dspy.Together(model="google/gemma-2-27b-it", temperature=0.3, max_tokens=4096)
+    lmclient.install(lm)
+    dspy.settings.configure(lm=lm)
+    start = time.perf_counter()
+    expanded = expand_statements()
+    print(f"expanded {len(expanded)} statements in {time.perf_counter() - start:.1f}s")
+    print(lm.session.snapshot())
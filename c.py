@@ -1,30 +1,20 @@
 import dspy
-import logging
-import random
+import atexit
+import runlog
 from dspy import InputField, OutputField, Signature
 from problem import Problem
 from vor2 import Desc2PlanGenerator, Plan2CodeGenerator, ReviseCode, RevisePlan
+from routing import Router
+import lmclient
+from dedup import MAX_TEMPERATURE, SimilarityIndex
+from solved_store import SolvedStore
 
-# Configure logging with random colors
-def get_random_color():
-    return random.choice(['\033[91m', '\033[92m', '\033[93m', '\033[94m', '\033[95m', '\033[96m'])
-
-class ColoredFormatter(logging.Formatter):
-    def format(self, record):
-        color = get_random_color()
-        reset = '\033[0m'
-        return f"{color}{super().format(record)}{reset}"
-
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-handler = logging.StreamHandler()
-handler.setFormatter(ColoredFormatter('%(asctime)s - %(levelname)s - Line %(lineno)d: %(message)s'))
-logger.addHandler(handler)
+logger = runlog.setup(__name__)
 
 def extract_code(response: str) -> str:
     # extract all text between <code> and </code> tags
     # there might be multiple code blocks, return the first one
-    logger.info(f"Extracting code from response: {response}")
+    runlog.event(logger, "extract_code", response=response)
     import re
     code_blocks = re.findall(r'<code>(.*?)</code>', response, re.DOTALL)
     out =  code_blocks[-1] if code_blocks else ""
@@ -36,7 +26,7 @@ class Agent:
     def __init__(self):
         self.desc2plan = Desc2PlanGenerator()
         self.plan2code = Plan2CodeGenerator()
-        self.revise_code = ReviseCode()
+        self.revise_code = ReviseCode(mode="diff")
         self.revise_plan = RevisePlan()
 
     def get_plan(self, desc: str, guidelines :str =""):
@@ -53,24 +43,52 @@ class Agent:
         )
         return response.cpp_program
     
-    def revise_code(self, plan, broken_code, error, input_output_format):
+    def revise_code(self, plan, broken_code, error, input_output_format, config=None):
         response = self.revise_code(
             plan=plan,
             broken_code=broken_code,
             error=error,
-            input_output_format=input_output_format
+            input_output_format=input_output_format,
+            config=config
         )
         return response
 
 
-    def revise_plan(self, plan, problem_description, error):
+    def revise_plan(self, plan, problem_description, error, config=None):
         response = self.revise_plan(
             plan=plan,
             problem_description=problem_description,
             error=error,
+            config=config
         )
         return response
 
+def revise_plan(agent, plans, plan, problem_description, error, temperature):
+    '''
+    returns (plan, temperature, is_new). A near-duplicate of an earlier plan is dropped, since it
+    would only repeat the same code generation and tests, and the next revision runs hotter.
+    '''
+    with runlog.timed(logger, "revise_plan", temperature=temperature) as fields:
+        new_plan = agent.revise_plan(plan, problem_description, error, config={"temperature": temperature})
+        _, similarity = plans.nearest(new_plan)
+        fields.update(plan=new_plan, similarity=round(similarity, 3))
+    if similarity >= plans.threshold:
+        return plan, min(MAX_TEMPERATURE, temperature + 0.2), False
+    plans.add(new_plan)
+    return new_plan, temperature, True
+
+def test_code(problem, codes, code):
+    # an identical program (up to indentation) gets the same verdict, don't compile and run it again
+    entry = codes.find_exact(code)
+    if entry is not None:
+        runlog.event(logger, "test_code", duplicate_of=entry)
+        return codes.payloads[entry]
+    with runlog.timed(logger, "test_code") as fields:
+        score, failed_testcases = problem.test_code(code, fail_fast=True)
+        fields.update(score=score, failed=len(failed_testcases), failed_testcases=failed_testcases)
+    codes.add(code, (score, failed_testcases))
+    return score, failed_testcases
+
 if __name__ == "__main__":
     problem_name = "Walk the Line"
     with open(f"Hacker cup/{problem_name}/statement.txt", "r") as f:
@@ -80,6 +98,8 @@ if __name__ == "__main__":
         sample_in_file=f"Hacker cup/{problem_name}/sample_in.txt", 
         sample_out_file=f"Hacker cup/{problem_name}/sample_out.txt"
     )
+    # compiled candidates live in a private build dir, remove it however the run ends
+    atexit.register(problem.cleanup)
 
     lm = dspy.Together(
         # model="meta-llama/Llama-3-70b-chat-hf", # Note: didn't find much a difference btwn mini & full gpt-4o
@@ -89,43 +109,60 @@ if __name__ == "__main__":
         # stop='hi',
     )
 
+    lmclient.install(lm)
     dspy.settings.configure(lm=lm)
     dspy.configure(experimental=True)
-    agent = Agent()
+    router = Router()
+    atexit.register(lambda: print(router.report()))
+    # connection pool / rate limit counters of the endpoint shared by all routed LMs
+    atexit.register(lambda: print(lmclient.shared_session().snapshot()))
+    agent = router.install(Agent())
 
     text_desc = problem.desc.split("Input Format")[0]
     input_output_format = problem.desc.split("Input Format")[1]
-    guidelines = ""
-    plan = agent.get_plan(text_desc, guidelines=guidelines)
-    logger.info(f"Generated Plan: {plan}")
+    # warm start from related problems solved in earlier runs
+    store = SolvedStore()
+    guidelines = store.guidelines(problem.desc, exclude=problem_name)
+    runlog.event(logger, "retrieved_guidelines", guidelines=guidelines)
+    with runlog.timed(logger, "desc2plan") as fields:
+        plan = agent.get_plan(text_desc, guidelines=guidelines)
+        fields["plan"] = plan
+    plans = SimilarityIndex(threshold=0.9)
+    codes = SimilarityIndex()
+    plans.add(plan)
+    plan_temperature = code_temperature = lm.kwargs["temperature"]
 
     for _ in range(5):
-        plan = agent.revise_plan(plan, text_desc, "YOU ARE WRONG!! TRY AGAIN VERBOSE")
-        logger.info(f"New Generated Plan: {plan}")
-
+        plan, plan_temperature, _ = revise_plan(agent, plans, plan, text_desc, "YOU ARE WRONG!! TRY AGAIN VERBOSE", plan_temperature)
 
+    plan_is_new = True
+    iterations = 0
     for _ in range(3):
 
-        # first generation
-        code = agent.get_code(plan, input_output_format)
-        logger.info(f"Generated C++ program: {code}")
-        # print(code)
-        score, failed_testcases = problem.test_code(code)
-        guidelines = failed_testcases
-        logger.info(f"Test results - Score: {score}, Failed testcases: {failed_testcases}")
-        
-
-        # fix code loop
-        for _ in range(2):
-            code = agent.revise_code(plan, code, failed_testcases, input_output_format)
+        if plan_is_new:
+            # first generation
+            with runlog.timed(logger, "plan2code") as fields:
+                code = agent.get_code(plan, input_output_format)
+                fields["code"] = code
             # print(code)
-            logger.info(f"Generated C++ program: {code}")
-            score, failed_testcases = problem.test_code(code)
+            score, failed_testcases = test_code(problem, codes, code)
             guidelines = failed_testcases
-            logger.info(f"Test results - Score: {score}, Failed testcases: {failed_testcases}")
-            if score == 1.0:
-                exit(0)
 
-        plan = agent.revise_plan(plan, text_desc, guidelines)
-        # print(plan)
-        logger.info(f"New Generated Plan: {plan}")
+
+            # fix code loop
+            for _ in range(2):
+                iterations += 1
+                with runlog.timed(logger, "revise_code") as fields:
+                    code = agent.revise_code(plan, code, failed_testcases, input_output_format, config={"temperature": code_temperature})
+                    fields["code"] = code
+                # print(code)
+                if codes.find_exact(code) is not None:
+                    code_temperature = min(MAX_TEMPERATURE, code_temperature + 0.2)
+                score, failed_testcases = test_code(problem, codes, code)
+                guidelines = failed_testcases
+                if score == 1.0:
+                    store.add(problem_name, problem.desc, plan, code, score, iterations=iterations,
+                              seconds=sum(result["seconds"] for result in problem.last_results))
+                    exit(0)
+
+        plan, plan_temperature, plan_is_new = revise_plan(agent, plans, plan, text_desc, guidelines, plan_temperature)
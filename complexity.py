@@ -0,0 +1,196 @@
+import math
+import os
+import random
+import subprocess
+import tempfile
+import time
+
+from problem import Problem
+
+# Empirical complexity estimation: run a compiled candidate on one generated test case of
+# size n, 2n, 4n, ... fit the runtimes against the usual growth orders and extrapolate to
+# the largest input allowed by the constraints.
+
+
+def _walk_the_line(n, rng):
+    speeds = "\n".join(str(rng.randint(1, 10**9)) for _ in range(n))
+    return f"1\n{n} {rng.randint(1, 10**9)}\n{speeds}\n"
+
+
+def _line_by_line(n, rng):
+    return f"1\n{max(2, n)} {rng.randint(1, 99)}\n"
+
+
+def _line_of_delivery_1(n, rng):
+    energies = "\n".join(map(str, rng.sample(range(1, 10**6 + 1), n)))
+    return f"1\n{n} {rng.randint(1, 10**6)}\n{energies}\n"
+
+
+def _line_of_delivery_2(n, rng):
+    energies = "\n".join(str(rng.randint(n, 10**6)) for _ in range(n))
+    return f"1\n{n} {rng.randint(1, 10**6)}\n{energies}\n"
+
+
+def _fall_in_line(n, rng):
+    points = set()
+    while len(points) < max(2, n):
+        points.add((rng.randint(-10**9, 10**9), rng.randint(-10**9, 10**9)))
+    return f"1\n{len(points)}\n" + "\n".join(f"{x} {y}" for x, y in points) + "\n"
+
+
+# seconds a full input may take before a candidate counts as too slow
+TIME_LIMIT = 60.0
+
+# measurements shorter than this (after subtracting start up) are treated as noise
+MIN_SECONDS = 0.005
+
+# problem name -> (single case generator, largest N of one case, largest total N over all cases of a file)
+GENERATORS = {
+    "Walk the Line": (_walk_the_line, 1000, 95 * 1000),
+    "Line by Line": (_line_by_line, 1000, 100 * 1000),
+    "Line of Delivery (Part 1)": (_line_of_delivery_1, 300000, 2000000),
+    "Line of Delivery (Part 2)": (_line_of_delivery_2, 300000, 2000000),
+    "Fall in Line": (_fall_in_line, 1000000, 4000000),
+}
+
+# name -> f(n), fitted as runtime = c * f(n)
+MODELS = {
+    "O(1)": lambda n: 1.0,
+    "O(log N)": lambda n: math.log2(n),
+    "O(N)": lambda n: n,
+    "O(N log N)": lambda n: n * math.log2(n),
+    "O(N^2)": lambda n: n ** 2,
+    "O(N^2 log N)": lambda n: n ** 2 * math.log2(n),
+    "O(N^3)": lambda n: n ** 3,
+    "O(2^N)": lambda n: 2.0 ** min(n, 1000),
+}
+
+
+def fit(points):
+    '''
+    points: [(n, seconds)], returns (model name, constant, log-log slope)
+    '''
+    best = None
+    for name, f in MODELS.items():
+        logs = [math.log(t) - math.log(f(n)) for n, t in points]
+        log_c = sum(logs) / len(logs)
+        error = sum((value - log_c) ** 2 for value in logs)
+        if best is None or error < best[2]:
+            best = (name, math.exp(log_c), error)
+    (n0, t0), (n1, t1) = points[0], points[-1]
+    slope = math.log(t1 / t0) / math.log(n1 / n0) if n1 > n0 else 0.0
+    return best[0], best[1], slope
+
+
+# returned by _time_run for a non-zero exit (segfault, stack overflow, failed assert, ...)
+CRASHED = "RE"
+
+
+def _time_run(executable, input_file, timeout):
+    with open(input_file, "r") as f:
+        start = time.perf_counter()
+        try:
+            result = subprocess.run([executable], stdin=f, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return None
+        if result.returncode != 0:
+            return CRASHED
+        return time.perf_counter() - start
+
+
+def measure(problem: Problem, code: str, problem_name: str, filename: str = "complexity",
+            start: int = None, time_budget: float = 2.0, repeats: int = 2, seed: int = 0):
+    '''
+    returns a dict with the fitted complexity and the runtime projected to the full constraints,
+    or None when the problem has no generator or the program does not compile.
+    A program that crashes at some N is reported with crashed_at=N and an infinite projection.
+    '''
+    if problem_name not in GENERATORS:
+        return None
+    generate, max_n, max_total = GENERATORS[problem_name]
+    executable = problem.compile_cpp(code, filename)
+    if executable is None:
+        return None
+
+    rng = random.Random(seed)
+    start = start or max(8, max_n // 512)
+    points = []
+    timed_out = False
+    crashed_at = None
+    with tempfile.TemporaryDirectory() as work_dir:
+        # process start up and I/O of a tiny case, subtracted from every measurement
+        baseline_file = os.path.join(work_dir, "baseline.txt")
+        with open(baseline_file, "w") as f:
+            f.write(generate(2, rng))
+        baseline_runs = [_time_run(executable, baseline_file, time_budget) for _ in range(repeats)]
+        if CRASHED in baseline_runs:
+            crashed_at = 2
+        baseline = min(seconds if isinstance(seconds, float) else 0.0 for seconds in baseline_runs)
+
+        n = start
+        while n <= max_n and crashed_at is None:
+            input_file = os.path.join(work_dir, f"{n}.txt")
+            with open(input_file, "w") as f:
+                f.write(generate(n, rng))
+            runs = [_time_run(executable, input_file, time_budget) for _ in range(repeats)]
+            if CRASHED in runs:
+                crashed_at = n
+                break
+            if any(seconds is None for seconds in runs):
+                timed_out = True
+                break
+            points.append((n, max(min(runs) - baseline, 1e-5)))
+            if min(runs) > time_budget / 2:
+                break
+            n *= 2
+
+    if crashed_at is not None:
+        return {"complexity": "unknown", "slope": None, "points": points, "max_n": max_n,
+                "projected_seconds": math.inf, "timed_out": False, "crashed_at": crashed_at}
+    if timed_out and not points:
+        return {"complexity": "unknown", "slope": None, "points": points, "max_n": max_n,
+                "projected_seconds": math.inf, "timed_out": True, "crashed_at": None}
+    # points within timer noise of the baseline say nothing about the growth order
+    significant = [(n, seconds) for n, seconds in points if seconds >= MIN_SECONDS]
+    if len(significant) < 2:
+        # fast up to some N and then out of budget at 2N: the growth is unknown but explosive
+        projected = math.inf if timed_out else max(MIN_SECONDS, points[-1][1]) * max_total / points[-1][0]
+        return {"complexity": "below timing resolution", "slope": None, "points": points, "max_n": max_n,
+                "projected_seconds": projected, "timed_out": timed_out, "crashed_at": None}
+    name, constant, slope = fit(significant)
+    projected = constant * MODELS[name](max_n) * max_total / max_n
+    if timed_out:
+        # the fit missed whatever made the next size time out, never project an accepted runtime
+        projected = max(projected, TIME_LIMIT)
+    return {
+        "complexity": name,
+        "slope": slope,
+        "points": points,
+        "max_n": max_n,
+        "projected_seconds": projected,
+        "timed_out": timed_out,
+        "crashed_at": None,
+    }
+
+
+def describe(result) -> str:
+    if result is None:
+        return ""
+    if result["crashed_at"] is not None:
+        return (f"MEASURED: the program crashed (non-zero exit status) at N={result['crashed_at']}; it must handle "
+                f"every N up to {result['max_n']} (check array sizes, recursion depth and overflow).")
+    if not result["points"]:
+        return f"MEASURED: the program did not finish even the smallest generated test; it is far too slow for N up to {result['max_n']}."
+    sizes = f"N={result['points'][0][0]}..{result['points'][-1][0]}"
+    if result["slope"] is None and result["timed_out"]:
+        return (f"MEASURED: on {sizes} the program runs too fast to time reliably, but it timed out at "
+                f"N={result['points'][-1][0] * 2}; it will not finish the full input (N up to {result['max_n']}) in time.")
+    if result["slope"] is None:
+        return (f"MEASURED: on {sizes} the program runs too fast to time reliably; projected runtime on the largest "
+                f"full input (N={result['max_n']} per case) is below {result['projected_seconds']:.1f} seconds.")
+    text = (f"MEASURED: running the compiled program on {sizes}, the runtime grows like {result['complexity']} "
+            f"(log-log slope {result['slope']:.2f}). Projected runtime on the largest full input "
+            f"(N={result['max_n']} per case) is about {result['projected_seconds']:.1f} seconds.")
+    if result["timed_out"]:
+        text += f" It timed out at N={result['points'][-1][0] * 2}."
+    return text
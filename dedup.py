@@ -0,0 +1,78 @@
+import hashlib
+import random
+import re
+import zlib
+
+# Near-duplicate detection for plans and programs generated during a run. Texts are reduced
+# to word shingles and MinHash signatures; similarity is the estimated Jaccard similarity of
+# the shingle sets. Exact matches are looked up by hash of the text with each line stripped;
+# only the similarity estimate is case and whitespace insensitive, since a change of case or
+# spacing inside a string literal is a different program.
+
+_PRIME = (1 << 61) - 1
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+# ceiling for the temperature bumps the drivers apply after generating a duplicate
+MAX_TEMPERATURE = 1.5
+
+
+def normalize(text: str) -> str:
+    return " ".join(_TOKEN.findall(str(text).lower()))
+
+
+def exact_key(text: str) -> str:
+    lines = [line.strip() for line in str(text).strip().split("\n")]
+    return hashlib.sha1("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def shingles(text: str, size: int = 3) -> set:
+    tokens = normalize(text).split()
+    if len(tokens) < size:
+        return {" ".join(tokens)}
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+class SimilarityIndex:
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, shingle_size: int = 3, seed: int = 0) -> None:
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        rng = random.Random(seed)
+        self.permutations = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self.signatures = []
+        self.payloads = []
+        self.exact = {}
+
+    def signature(self, text: str) -> list:
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text, self.shingle_size)]
+        return [min((a * h + b) % _PRIME for h in hashes) for a, b in self.permutations]
+
+    def add(self, text: str, payload=None) -> int:
+        entry = len(self.signatures)
+        self.signatures.append(self.signature(text))
+        self.payloads.append(payload)
+        self.exact.setdefault(exact_key(text), entry)
+        return entry
+
+    def find_exact(self, text: str):
+        '''
+        entry id of an identical text (ignoring leading / trailing whitespace of lines), or None
+        '''
+        return self.exact.get(exact_key(text))
+
+    def nearest(self, text: str):
+        '''
+        (entry id, estimated similarity) of the most similar indexed text, (None, 0.0) if empty
+        '''
+        entry = self.find_exact(text)
+        if entry is not None:
+            return entry, 1.0
+        signature = self.signature(text)
+        best, best_similarity = None, 0.0
+        for index, other in enumerate(self.signatures):
+            similarity = sum(x == y for x, y in zip(signature, other)) / len(signature)
+            if similarity > best_similarity:
+                best, best_similarity = index, similarity
+        return best, best_similarity
+
+    def is_duplicate(self, text: str) -> bool:
+        return self.nearest(text)[1] >= self.threshold
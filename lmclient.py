@@ -0,0 +1,204 @@
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Drop-in replacement for the requests.Session that dsp's Together client posts through:
+# keeps connections alive in a pool, limits concurrency, rate limits requests and tokens per
+# minute and retries 429 / 5xx with jittered exponential backoff, honoring Retry-After.
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, capacity: float = None) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0):
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def estimate_tokens(body) -> int:
+    '''
+    prompt characters / 4 plus the completion budget, used to charge the tokens-per-minute bucket
+    '''
+    if not isinstance(body, dict):
+        return 1
+    text = body.get("prompt") or "".join(message.get("content", "") for message in body.get("messages", []))
+    return len(text) // 4 + int(body.get("max_tokens") or 0)
+
+
+class PooledSession(requests.Session):
+    def __init__(self, pool_size: int = 16, max_concurrency: int = 8, requests_per_minute: float = 600,
+                 tokens_per_minute: float = None, max_retries: int = 6, backoff_base: float = 1.0,
+                 backoff_max: float = 60.0) -> None:
+        super().__init__()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.metrics_lock = threading.Lock()
+        self.metrics = {"requests": 0, "retries": 0, "rate_limited": 0, "in_flight": 0, "queued": 0,
+                        "max_in_flight": 0, "max_queued": 0}
+
+    def _count(self, key: str, delta: int = 1):
+        with self.metrics_lock:
+            self.metrics[key] += delta
+            peak = "max_" + key
+            if peak in self.metrics:
+                self.metrics[peak] = max(self.metrics[peak], self.metrics[key])
+
+    def _backoff(self, attempt: int, response) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        # full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _acquire(self, tokens: int):
+        self._count("queued")
+        try:
+            self.request_bucket.acquire()
+            if self.token_bucket is not None:
+                self.token_bucket.acquire(tokens)
+            self.slots.acquire()
+        finally:
+            self._count("queued", -1)
+        self._count("in_flight")
+
+    def request(self, method, url, *args, **kwargs):
+        tokens = estimate_tokens(kwargs.get("json"))
+        for attempt in range(self.max_retries + 1):
+            # every attempt is a request against the limits, retries included
+            self._acquire(tokens)
+            self._count("requests")
+            response = None
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            else:
+                if response.status_code != 429 and response.status_code < 500:
+                    return response
+                if attempt == self.max_retries:
+                    return response
+                if response.status_code == 429:
+                    self._count("rate_limited")
+                response.close()
+            finally:
+                self._count("in_flight", -1)
+                self.slots.release()
+            # back off without holding a concurrency slot
+            self._count("retries")
+            time.sleep(self._backoff(attempt, response))
+
+    def snapshot(self) -> dict:
+        with self.metrics_lock:
+            return dict(self.metrics)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_session(**kwargs) -> PooledSession:
+    '''
+    the PooledSession every LM of this process posts through, created with `kwargs` on first use.
+    All models are served by one endpoint, so they share its connection pool and rate limits.
+    '''
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = PooledSession(**kwargs)
+        return _shared
+
+
+def install(lm, session: PooledSession = None, **kwargs):
+    '''
+    swap the session of a dsp client (e.g. dspy.Together) for the shared PooledSession, or `session`
+    '''
+    lm.session = session or shared_session(**kwargs)
+    return lm
+
+
+def _stand_in_server(latency: float = 0.05, rate_limit_every: int = 3):
+    '''
+    local Together-like endpoint: answers after `latency` seconds and returns 429 with
+    Retry-After for every `rate_limit_every`-th request
+    '''
+    import json
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    counter = {"n": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with lock:
+                counter["n"] += 1
+                limited = rate_limit_every and counter["n"] % rate_limit_every == 0
+            time.sleep(latency)
+            if limited:
+                body = b"{}"
+                self.send_response(429)
+                self.send_header("Retry-After", "0.1")
+            else:
+                body = json.dumps({"output": {"choices": [{"text": "ok"}]}}).encode()
+                self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+
+    server = _stand_in_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    session = PooledSession(max_concurrency=4, requests_per_minute=1200, tokens_per_minute=200000)
+    body = {"model": "stand-in", "prompt": "hello " * 100, "max_tokens": 64}
+
+    def call(_):
+        with session.post(url, json=body) as response:
+            return response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        statuses = list(pool.map(call, range(40)))
+    print(f"{statuses.count(200)}/{len(statuses)} ok in {time.perf_counter() - start:.2f}s")
+    print(session.snapshot())
+    server.shutdown()
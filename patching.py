@@ -0,0 +1,108 @@
+import re
+
+# Applies model-written edits to a program: search/replace blocks
+#
+#   <<<<<<< SEARCH
+#   old lines
+#   =======
+#   new lines
+#   >>>>>>> REPLACE
+#
+# or a unified diff. Every edit must match the program exactly once, otherwise PatchError is
+# raised and the caller falls back to regenerating the whole program.
+
+
+class PatchError(Exception):
+    pass
+
+
+_BLOCK = re.compile(r"<{5,}\s*SEARCH[^\n]*\n(.*?)\n?={5,}[^\n]*\n(.*?)\n?>{5,}\s*REPLACE", re.DOTALL)
+_HUNK = re.compile(r"^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+
+def _replace_once(lines: list, old: list, new: list) -> list:
+    if not old:
+        raise PatchError("empty search block")
+    matches = [i for i in range(len(lines) - len(old) + 1) if lines[i:i + len(old)] == old]
+    if not matches:
+        # models often get indentation / trailing spaces wrong, retry ignoring surrounding whitespace
+        stripped = [line.strip() for line in lines]
+        old_stripped = [line.strip() for line in old]
+        matches = [i for i in range(len(lines) - len(old) + 1) if stripped[i:i + len(old)] == old_stripped]
+    if len(matches) != 1:
+        raise PatchError(f"search block matches {len(matches)} times:\n" + "\n".join(old))
+    i = matches[0]
+    return lines[:i] + new + lines[i + len(old):]
+
+
+def _search_replace_edits(text: str):
+    return [(old.split("\n"), new.split("\n") if new else []) for old, new in _BLOCK.findall(text)]
+
+
+def _unified_diff_edits(text: str):
+    edits = []
+    old, new = None, None
+    lines = text.split("\n")
+    for i, line in enumerate(lines):
+        # "---" / "+++" are file headers before the first hunk or right before the next hunk
+        # header; inside a hunk they are a removed "--i;" or an added "++c;"
+        if old is None and (line.startswith("---") or line.startswith("+++")):
+            continue
+        if line.startswith("---") and lines[i + 1:i + 2] and lines[i + 1].startswith("+++") \
+                and lines[i + 2:i + 3] and _HUNK.match(lines[i + 2]):
+            continue
+        if line.startswith("+++") and i > 0 and lines[i - 1].startswith("---") \
+                and lines[i + 1:i + 2] and _HUNK.match(lines[i + 1]):
+            continue
+        if _HUNK.match(line):
+            if old is not None:
+                edits.append((old, new))
+            old, new = [], []
+        elif old is None:
+            continue
+        elif line.startswith("+"):
+            new.append(line[1:])
+        elif line.startswith("-"):
+            old.append(line[1:])
+        elif line.startswith(" ") or line == "":
+            old.append(line[1:])
+            new.append(line[1:])
+    if old is not None:
+        edits.append((old, new))
+    # a trailing blank line is usually an artifact of the surrounding markdown
+    for old, new in edits:
+        while old and new and old[-1] == "" and new[-1] == "":
+            old.pop()
+            new.pop()
+    return edits
+
+
+def apply_edits(code: str, text: str) -> str:
+    '''
+    apply the search/replace blocks or unified diff hunks in `text` to `code`
+    '''
+    edits = _search_replace_edits(text) or _unified_diff_edits(text)
+    if not edits:
+        raise PatchError("no edits found")
+    lines = code.split("\n")
+    for old, new in edits:
+        lines = _replace_once(lines, old, new)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    code = "int f(){\nint c=0;\nreturn c;\n}"
+    # hunk lines that look like file headers: an added "++c;" and a removed "--c;"
+    assert apply_edits(code, "@@ -1,3 +1,4 @@\n int c=0;\n+++c;\n return c;\n") == "int f(){\nint c=0;\n++c;\nreturn c;\n}"
+    assert apply_edits("int c=0;\n--c;\nreturn c;", "@@ -1,3 +1,2 @@\n int c=0;\n---c;\n return c;\n") == "int c=0;\nreturn c;"
+    # real file headers, before the first hunk and between hunks
+    diff = "--- a/f.cpp\n+++ b/f.cpp\n@@ -1 +1 @@\n-int f(){\n+int g(){\n--- a/f.cpp\n+++ b/f.cpp\n@@ -3 +3 @@\n-return c;\n+return c + 1;\n"
+    assert apply_edits(code, diff) == "int g(){\nint c=0;\nreturn c + 1;\n}"
+    assert apply_edits(code, "<<<<<<< SEARCH\nint c=0;\n=======\nint c=1;\n>>>>>>> REPLACE") == "int f(){\nint c=1;\nreturn c;\n}"
+    try:
+        apply_edits(code, "@@ -1 +1 @@\n-int missing;\n+int x;\n")
+    except PatchError:
+        pass
+    else:
+        raise AssertionError("unmatched hunk applied")
+    print("ok")
@@ -1,5 +1,13 @@
 import subprocess
 import os
+import time
+import hashlib
+import shutil
+import tempfile
+import threading
+
+# keep this module dependency free (stdlib only, nothing heavy at import time) so it
+# starts fast from the command line and inside the process pools that run tests
 
 class Problem:
     def __init__(self, desc, sample_in_file, sample_out_file) -> None:
@@ -13,57 +21,118 @@ class Problem:
         self.custom_test_in_files = []
         self.custom_test_out_files = []
         self.solutions = []
+        # compiled executables keyed by source hash, so every test of one program compiles once
+        self.build_dir = None
+        self.binaries = {}
+        self.build_lock = threading.Lock()
+        # one lock per source hash: identical candidates compiled concurrently build once, the rest wait
+        self.key_locks = {}
+        self.last_results = []
+        self.last_compile_seconds = 0.0
+        self.compile_errors = {}
+        # per test file failure history across evaluations, used to run likely failures first
+        self.test_history = {}
+
+    @classmethod
+    def from_dir(cls, problem_dir: str) -> "Problem":
+        '''
+        load statement.txt + sample_in/out.txt, any other <name>_in.txt with a matching <name>_out.txt is a custom test
+        '''
+        with open(os.path.join(problem_dir, "statement.txt"), "r") as f:
+            desc = f.read()
+        problem = cls(
+            desc=desc,
+            sample_in_file=os.path.join(problem_dir, "sample_in.txt"),
+            sample_out_file=os.path.join(problem_dir, "sample_out.txt"),
+        )
+        for name in sorted(os.listdir(problem_dir)):
+            if not name.endswith("_in.txt") or name == "sample_in.txt":
+                continue
+            out_file = os.path.join(problem_dir, name[:-len("_in.txt")] + "_out.txt")
+            if os.path.exists(out_file):
+                problem.custom_test_in_files.append(os.path.join(problem_dir, name))
+                problem.custom_test_out_files.append(out_file)
+        return problem
 
     def add_solution(self, solution: str):
         self.solutions.append(solution)
 
-    def run_cpp_solution(self, code: str, filename: str, input_file: str, timeout: int = 5) -> str:
-        filename = filename + ".cpp"
-        # save code to file
-        with open(filename, "w") as f:
-            f.write(code)
+    def compile_cpp(self, code: str, filename: str):
+        '''
+        return path to the executable for `code`, or None on compilation error (kept in self.compile_errors)
+        `filename` is unused, sources are written next to their executables in the private build dir
+        '''
+        key = self._key(code)
+        if key in self.binaries:
+            return self.binaries[key]
+
+        with self.build_lock:
+            if self.build_dir is None:
+                self.build_dir = tempfile.mkdtemp(prefix="problem_")
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # another thread may have built it while we waited
+            if key in self.binaries:
+                return self.binaries[key]
+            executable = os.path.join(self.build_dir, key)
+            source = executable + ".cpp"
+            # save code to file
+            with open(source, "w") as f:
+                f.write(code)
 
-        # Compile the C++ code
-        compile_command = f"g++ -std=c++17 {filename} -o temp_executable"
-        compile_result = subprocess.run(compile_command, shell=True, capture_output=True, text=True)
-        
-        if compile_result.returncode != 0:
-            print(f"Compilation error: {compile_result.stderr}")
+            # Compile the C++ code
+            compile_result = subprocess.run(["g++", "-std=c++17", "-O2", source, "-o", executable], capture_output=True, text=True)
+
+            if compile_result.returncode != 0:
+                print(f"Compilation error: {compile_result.stderr}")
+                self.compile_errors[key] = compile_result.stderr
+                executable = None
+            # published only once the build is complete, so nobody executes a half written binary
+            self.binaries[key] = executable
+        return executable
+
+    @staticmethod
+    def _key(code: str) -> str:
+        return hashlib.sha1(code.encode("utf-8")).hexdigest()[:16]
+
+    def cleanup(self):
+        if self.build_dir is not None:
+            shutil.rmtree(self.build_dir, ignore_errors=True)
+        self.build_dir = None
+        self.binaries = {}
+        self.compile_errors = {}
+        self.key_locks = {}
+
+    def _run(self, command: list, input_file: str, timeout: int) -> str:
+        with open(input_file, "r") as f:
+            try:
+                run_result = subprocess.run(command, stdin=f, capture_output=True, text=True, timeout=timeout)
+                output = run_result.stdout.strip()
+            except subprocess.TimeoutExpired:
+                output = "Timeout"
+        return output
+
+    def run_cpp_solution(self, code: str, filename: str, input_file: str, timeout: int = 5) -> str:
+        executable = self.compile_cpp(code, filename)
+        if executable is None:
             return ""
-        
+
         # Run the compiled executable with timeout
-        run_command = f"./temp_executable < \"{input_file}\""
-        try:
-            run_result = subprocess.run(run_command, shell=True, capture_output=True, text=True, timeout=timeout)
-            output = run_result.stdout.strip()
-        except subprocess.TimeoutExpired:
-            output = "Timeout"
-        
-        # Clean up
-        os.remove("temp_executable")
-        
-        return output
+        return self._run([executable], input_file, timeout)
 
     def run_py_solution(self, code: str, filename: str, input_file: str, timeout: int = 5) -> str:
         filename = filename + ".py"
         # save code to file (python)
         with open(filename, "w") as f:
             f.write(code)
-        
+
         # Run the Python code with timeout
-        run_command = f"python {filename} < {input_file}"
-        try:
-            run_result = subprocess.run(run_command, shell=True, capture_output=True, text=True, timeout=timeout)
-            output = run_result.stdout.strip()
-        except subprocess.TimeoutExpired:
-            output = "Timeout"
-        
-        return output
+        return self._run(["python", filename], input_file, timeout)
 
     def test_solution(self, output: str, expected_output: str):
         if output == "Timeout":
             return 0, [("Timeout", "Expected output", "Timeout")]
-        
+
         output_lines = output.split('\n')
         expected_lines = expected_output.split('\n')
         correct_count = 0
@@ -76,34 +145,111 @@ class Problem:
         score = correct_count / len(expected_lines)
         return score, wrong_cases
 
-    def test_code(self, code: str, filename: str = "temp", lang: str = "cpp") -> float:
+    def tests(self):
+        return [(self.sample_in_file, self.sample_out_file)] + list(zip(self.custom_test_in_files, self.custom_test_out_files))
+
+    def prioritized_tests(self):
+        '''
+        tests that failed before come first (most failures first, slowest to fail first on ties),
+        then the rest from fastest to slowest. Without history this is the original order.
+        '''
+        def priority(item):
+            index, (in_file, _) = item
+            history = self.test_history.get(in_file)
+            if history is None:
+                return (1, 0, 0.0, index)
+            if history["failures"] > 0:
+                return (0, -history["failures"], -history["seconds"], index)
+            return (1, 0, history["seconds"], index)
+        return [test for _, test in sorted(enumerate(self.tests()), key=priority)]
+
+    def record_result(self, in_file: str, passed: bool, seconds: float):
+        history = self.test_history.setdefault(in_file, {"runs": 0, "failures": 0, "seconds": 0.0})
+        history["runs"] += 1
+        history["failures"] += 0 if passed else 1
+        history["seconds"] = seconds
+
+    def test_code(self, code: str, filename: str = "temp", lang: str = "cpp", fail_fast: bool = False) -> float:
         '''
         return [0, 1] based on number of correct answers
+        per test verdicts and timings of the last call are kept in self.last_results
+        with fail_fast the remaining tests are skipped (and score 0) after the first failing one
+        a program that does not compile gets a single "CE" verdict and the compiler output as its failure
         '''
+        tests = self.prioritized_tests()
+        self.last_results = []
         if lang == "cpp":
             run_solution = self.run_cpp_solution
+            # compile up front so the per test timings only measure the run
+            start = time.perf_counter()
+            executable = self.compile_cpp(code, filename)
+            self.last_compile_seconds = time.perf_counter() - start
+            if executable is None:
+                self.last_results.append({"test": tests[0][0], "verdict": "CE", "score": 0.0, "seconds": 0.0})
+                return 0.0, [("Compilation error", "", self.compile_errors.get(self._key(code), ""))]
         else:
             run_solution = self.run_py_solution
 
-        # Test sample input
-        sample_output = run_solution(code, filename, self.sample_in_file)
-        with open(self.sample_out_file, 'r') as f:
-            expected_sample_output = f.read().strip()
-        sample_score, sample_wrong_cases = self.test_solution(sample_output, expected_sample_output)
-
-        # Test custom inputs
-        custom_scores = []
-        failed_testcases = sample_wrong_cases
-
-        for in_file, out_file in zip(self.custom_test_in_files, self.custom_test_out_files):
-            custom_output = run_solution(code, filename, in_file)
+        scores = []
+        failed_testcases = []
+        for in_file, out_file in tests:
+            start = time.perf_counter()
+            output = run_solution(code, filename, in_file)
+            seconds = time.perf_counter() - start
             with open(out_file, 'r') as f:
-                expected_custom_output = f.read().strip()
-            custom_score, custom_wrong_cases = self.test_solution(custom_output, expected_custom_output)
-            custom_scores.append(custom_score)
-            failed_testcases.extend(custom_wrong_cases)
+                expected_output = f.read().strip()
+            score, wrong_cases = self.test_solution(output, expected_output)
+            scores.append(score)
+            failed_testcases.extend(wrong_cases)
+            if output == "Timeout":
+                verdict = "TLE"
+            elif score == 1.0:
+                verdict = "OK"
+            else:
+                verdict = "WA"
+            self.last_results.append({"test": in_file, "verdict": verdict, "score": score, "seconds": seconds})
+            self.record_result(in_file, score == 1.0, seconds)
+            if fail_fast and score < 1.0:
+                break
 
         # Calculate overall score
-        total_score = (sample_score + sum(custom_scores)) / (1 + len(custom_scores))
-        
-        return total_score, failed_testcases
\ No newline at end of file
+        total_score = sum(scores) / len(tests)
+
+        return total_score, failed_testcases
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Evaluate a solution file against a problem directory.")
+    parser.add_argument("problem_dir", help="directory with statement.txt, sample_in.txt and sample_out.txt")
+    parser.add_argument("solution", help="solution source file (.cpp or .py)")
+    parser.add_argument("--lang", choices=["cpp", "py"], default=None, help="defaults to the solution file extension")
+    args = parser.parse_args(argv)
+
+    lang = args.lang or ("py" if args.solution.endswith(".py") else "cpp")
+    with open(args.solution, "r") as f:
+        code = f.read()
+
+    problem = Problem.from_dir(args.problem_dir)
+    try:
+        with tempfile.TemporaryDirectory(prefix="solution_") as work_dir:
+            score, failed_testcases = problem.test_code(code, filename=os.path.join(work_dir, "solution"), lang=lang)
+    finally:
+        problem.cleanup()
+
+    if lang == "cpp":
+        print(f"compile  {problem.last_compile_seconds:.3f}s")
+    for result in problem.last_results:
+        print(f"{result['verdict']:>3}  {result['score']:.3f}  {result['seconds']:.3f}s  {result['test']}")
+    for case, expected, actual in failed_testcases:
+        if case == "Compilation error":
+            # compile_cpp already printed the compiler output
+            continue
+        print(f"  {case}: expected {expected!r}, got {actual!r}")
+    print(f"score: {score:.3f}")
+    return 0 if score == 1.0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import defaultdict
+
+import dspy
+import lmclient
+
+# Per-stage model routing. Every predictor of a module is matched against ROUTES by
+# "<ModuleClass>.<attribute>", then "<ModuleClass>", then the signature class name, then
+# "<attribute>"; the first hit picks a profile from PROFILES. Unmatched predictors inherit
+# the profile of the enclosing module, and at the top level keep the globally configured LM.
+
+PROFILES = {
+    "light": {"model": "google/gemma-2-9b-it", "max_tokens": 512, "temperature": 0.0},
+    "strong": None,  # the LM passed to dspy.settings.configure
+}
+
+ROUTES = {
+    "IsTimeEfficient": "light",
+    "IsTimeEfficientSignature": "light",
+    "SummarizeGuideline": "light",
+    "UpdatePlan.is_statement_crucial": "light",
+    "key_sentences": "light",
+    "is_time_efficient": "light",
+}
+
+
+class MeteredLM:
+    '''
+    thin proxy around a dsp LM that records per stage call count, latency and token usage
+    '''
+    def __init__(self, lm, stage: str, stats: dict, lock: threading.Lock) -> None:
+        self.lm = lm
+        self.stage = stage
+        self.stats = stats
+        # the stats are shared by every stage and predictors may run on several threads
+        self.lock = lock
+
+    def __getattr__(self, name):
+        return getattr(self.lm, name)
+
+    def __call__(self, *args, **kwargs):
+        history_len = len(getattr(self.lm, "history", []))
+        start = time.perf_counter()
+        try:
+            return self.lm(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            prompt_tokens = completion_tokens = 0
+            for entry in getattr(self.lm, "history", [])[history_len:]:
+                response = entry.get("response") or {}
+                usage = response.get("usage") if isinstance(response, dict) else None
+                if usage:
+                    prompt_tokens += usage.get("prompt_tokens", 0)
+                    completion_tokens += usage.get("completion_tokens", 0)
+                else:
+                    # Together responses carry no usage, estimate ~4 characters per token
+                    prompt_tokens += len(entry.get("prompt") or "") // 4
+                    choices = response.get("choices", []) if isinstance(response, dict) else []
+                    completion_tokens += sum(len(choice.get("text") or "") for choice in choices) // 4
+            with self.lock:
+                stats = self.stats[self.stage]
+                stats["calls"] += 1
+                stats["seconds"] += seconds
+                stats["prompt_tokens"] += prompt_tokens
+                stats["completion_tokens"] += completion_tokens
+
+
+class Router:
+    def __init__(self, profiles: dict = None, routes: dict = None, lm_class=None) -> None:
+        self.profiles = PROFILES if profiles is None else profiles
+        self.routes = ROUTES if routes is None else routes
+        self.lm_class = lm_class or dspy.Together
+        self.lms = {}
+        self.stats = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0})
+        self.stats_lock = threading.Lock()
+
+    def profile_for(self, module_name: str, attribute: str, inherited: str = "strong", signature_name: str = "") -> str:
+        for key in (f"{module_name}.{attribute}", module_name, signature_name, attribute):
+            if key in self.routes:
+                return self.routes[key]
+        return inherited
+
+    def lm_for(self, profile: str):
+        if profile not in self.lms:
+            config = self.profiles.get(profile)
+            self.lms[profile] = lmclient.install(self.lm_class(**config)) if config else None
+        return self.lms[profile] or dspy.settings.lm
+
+    def install(self, module, inherited: str = "strong"):
+        '''
+        point every predictor inside `module` (recursively) at the LM of its routed profile,
+        nested modules without a route of their own inherit the profile of their parent
+        '''
+        name = type(module).__name__
+        module_profile = self.routes.get(name, inherited)
+        for attribute, value in vars(module).items():
+            if isinstance(value, dspy.Predict):
+                signature_name = getattr(value.signature, "__name__", "")
+                profile = self.profile_for(name, attribute, module_profile, signature_name)
+                value.forward = self._routed(value.forward, MeteredLM(self.lm_for(profile), f"{name}.{attribute} [{profile}]", self.stats, self.stats_lock))
+            elif isinstance(value, dspy.Module):
+                self.install(value, module_profile)
+        return module
+
+    @staticmethod
+    def _routed(forward, lm):
+        # swap the LM through the settings context rather than Predict.lm, which would
+        # also switch the predictor to query_only and drop the signature instructions
+        def routed_forward(**kwargs):
+            with dspy.settings.context(lm=lm):
+                return forward(**kwargs)
+        return routed_forward
+
+    def report(self) -> str:
+        lines = [f"{'stage':<70} {'calls':>5} {'seconds':>8} {'prompt':>8} {'compl':>8}"]
+        with self.stats_lock:
+            snapshot = {stage: dict(stats) for stage, stats in self.stats.items()}
+        for stage, stats in sorted(snapshot.items(), key=lambda item: -item[1]["seconds"]):
+            lines.append(f"{stage:<70} {stats['calls']:>5} {stats['seconds']:>8.2f} {stats['prompt_tokens']:>8} {stats['completion_tokens']:>8}")
+        return "\n".join(lines)
@@ -0,0 +1,172 @@
+import atexit
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from contextlib import contextmanager
+
+# string payloads longer than this are written once to the blob store and only referenced by hash
+BLOB_THRESHOLD = 200
+
+COLORS = {
+    logging.DEBUG: '\033[96m',
+    logging.INFO: '\033[92m',
+    logging.WARNING: '\033[93m',
+    logging.ERROR: '\033[91m',
+}
+RESET = '\033[0m'
+
+
+class BlobStore:
+    '''
+    content addressed store for large payloads (plans, programs, LM responses)
+    '''
+    def __init__(self, blob_dir: str) -> None:
+        self.blob_dir = blob_dir
+        os.makedirs(blob_dir, exist_ok=True)
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha1(data).hexdigest()[:16]
+        path = os.path.join(self.blob_dir, digest + ".txt")
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(data)
+        return digest
+
+    def get(self, digest: str) -> str:
+        with open(os.path.join(self.blob_dir, digest + ".txt"), "r", encoding="utf-8") as f:
+            return f.read()
+
+
+class JsonlFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "line": record.lineno,
+        }
+        fields = getattr(record, "fields", None)
+        if fields is not None:
+            entry["stage"] = record.stage
+            entry.update(fields)
+        else:
+            entry["message"] = record.getMessage()
+        return json.dumps(entry, default=str)
+
+
+class BlobHandler(logging.Handler):
+    '''
+    runs in the listener thread ahead of the output handlers: moves large string fields of a
+    record into the blob store and replaces them with {"sha", "bytes"} references
+    '''
+    def __init__(self, blobs: BlobStore) -> None:
+        super().__init__()
+        self.blobs = blobs
+
+    def emit(self, record):
+        fields = getattr(record, "fields", None)
+        if fields is None:
+            return
+        for key, value in fields.items():
+            if isinstance(value, str) and len(value) > BLOB_THRESHOLD:
+                data = value.encode("utf-8")
+                fields[key] = {"sha": self.blobs.put(data), "bytes": len(data)}
+
+
+class SummaryFormatter(logging.Formatter):
+    '''
+    one short line per record for the terminal, blobs are shown as <hash:bytes>
+    '''
+    def __init__(self, max_len: int = 160) -> None:
+        super().__init__('%(asctime)s - %(levelname)s - Line %(lineno)d: %(message)s')
+        self.max_len = max_len
+
+    def format(self, record):
+        fields = getattr(record, "fields", None)
+        if fields is not None:
+            parts = []
+            for key, value in fields.items():
+                if isinstance(value, dict) and "sha" in value:
+                    value = f"<{value['sha']}:{value['bytes']}B>"
+                parts.append(f"{key}={value}")
+            record.msg, record.args = f"[{record.stage}] " + " ".join(parts), None
+        line = super().format(record)
+        if len(line) > self.max_len:
+            line = line[:self.max_len - 3] + "..."
+        return f"{COLORS.get(record.levelno, '')}{line}{RESET}"
+
+
+_blobs = None
+_listener = None
+_queue = None
+
+
+def setup(name: str, log_dir: str = "runs", max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+          console: bool = True, level: int = logging.INFO) -> logging.Logger:
+    '''
+    route `name` through a queue so logging never blocks the caller. A background
+    listener writes JSONL events to a rotating file and a summary to the console.
+    '''
+    global _blobs, _listener, _queue
+    os.makedirs(log_dir, exist_ok=True)
+    if _blobs is None:
+        _blobs = BlobStore(os.path.join(log_dir, "blobs"))
+
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    logger.propagate = False
+
+    if _listener is None:
+        _queue = queue.SimpleQueue()
+        file_handler = logging.handlers.RotatingFileHandler(
+            os.path.join(log_dir, "events.jsonl"), maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        file_handler.setFormatter(JsonlFormatter())
+        handlers = [BlobHandler(_blobs), file_handler]
+        if console:
+            stream_handler = logging.StreamHandler()
+            stream_handler.setFormatter(SummaryFormatter())
+            handlers.append(stream_handler)
+        _listener = logging.handlers.QueueListener(_queue, *handlers, respect_handler_level=False)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+    if not any(isinstance(h, logging.handlers.QueueHandler) for h in logger.handlers):
+        logger.addHandler(logging.handlers.QueueHandler(_queue))
+    return logger
+
+
+def _pack(value):
+    # only snapshot here (objects may change after the call), hashing and writing happen in the listener
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def event(logger: logging.Logger, stage: str, level: int = logging.INFO, **fields) -> None:
+    '''
+    log a structured event. Large string payloads are stored by hash instead of being re-printed.
+    '''
+    _emit(logger, stage, level, fields, stacklevel=3)
+
+
+def _emit(logger, stage, level, fields, stacklevel):
+    if not logger.isEnabledFor(level):
+        return
+    packed = {key: _pack(value) for key, value in fields.items()}
+    logger.log(level, stage, extra={"stage": stage, "fields": packed}, stacklevel=stacklevel)
+
+
+@contextmanager
+def timed(logger: logging.Logger, stage: str, **fields):
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        fields["seconds"] = round(time.perf_counter() - start, 3)
+        # report the line of the `with` statement, not this generator or contextlib
+        _emit(logger, stage, logging.INFO, fields, stacklevel=4)
@@ -0,0 +1,148 @@
+import os
+import re
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from problem import Problem
+
+# Sharded execution of multi-case inputs: split the T cases of an input file into shards
+# (each with its own T header), run the shards in parallel processes and merge the outputs
+# back in order with the "Case #i" labels rewritten to global indices.
+
+
+def _single_line(lines, i):
+    return i + 1
+
+
+def _n_lines_follow(lines, i):
+    # "N ..." header followed by N lines
+    return i + 1 + int(lines[i].split()[0])
+
+
+# problem name -> parse_case(lines, index of the first line of a case) -> index after the case
+CASE_PARSERS = {
+    "Walk the Line": _n_lines_follow,
+    "Line by Line": _single_line,
+    "Line of Delivery (Part 1)": _n_lines_follow,
+    "Line of Delivery (Part 2)": _n_lines_follow,
+    "Fall in Line": _n_lines_follow,
+}
+
+CASE_LABEL = re.compile(r"^Case #(\d+):", re.MULTILINE)
+
+
+def split_cases(text: str, parse_case):
+    '''
+    returns the list of cases, each a list of input lines
+    '''
+    lines = text.split("\n")
+    num_cases = int(lines[0].strip())
+    cases = []
+    i = 1
+    for _ in range(num_cases):
+        end = parse_case(lines, i)
+        cases.append(lines[i:end])
+        i = end
+    return cases
+
+
+def make_shards(cases: list, num_shards: int):
+    '''
+    contiguous groups of cases with roughly the same number of lines each
+    '''
+    total = sum(len(case) for case in cases)
+    target = total / max(1, num_shards)
+    shards = [[]]
+    size = 0
+    for case in cases:
+        if shards[-1] and size >= target and len(shards) < num_shards:
+            shards.append([])
+            size = 0
+        shards[-1].append(case)
+        size += len(case)
+    return shards
+
+
+def relabel(output: str, offset: int) -> str:
+    return CASE_LABEL.sub(lambda match: f"Case #{int(match.group(1)) + offset}:", output)
+
+
+def run_sharded(problem: Problem, code: str, input_file: str, parse_case, filename: str = "shard",
+                num_shards: int = None, timeout: int = 60) -> str:
+    '''
+    same result as problem.run_cpp_solution(code, filename, input_file) but with the cases
+    spread over `num_shards` parallel processes (default: one per core).
+    If any shard times out or exits non-zero the whole run fails with "Timeout" / "RE", since a
+    partial shard output would leave cases missing and the later labels misaligned.
+    '''
+    executable = problem.compile_cpp(code, filename)
+    if executable is None:
+        return ""
+
+    with open(input_file, "r") as f:
+        cases = split_cases(f.read(), parse_case)
+    shards = make_shards(cases, num_shards or os.cpu_count() or 1)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        shard_files = []
+        for index, shard in enumerate(shards):
+            shard_file = os.path.join(work_dir, f"{index}.txt")
+            with open(shard_file, "w") as f:
+                f.write(f"{len(shard)}\n" + "\n".join("\n".join(case) for case in shard) + "\n")
+            shard_files.append(shard_file)
+
+        def run(shard_file):
+            with open(shard_file, "r") as f:
+                try:
+                    result = subprocess.run([executable], stdin=f, capture_output=True, text=True, timeout=timeout)
+                except subprocess.TimeoutExpired:
+                    return "Timeout"
+            if result.returncode != 0:
+                return "RE"
+            return result.stdout.strip()
+
+        with ThreadPoolExecutor(max_workers=len(shard_files)) as pool:
+            outputs = list(pool.map(run, shard_files))
+
+    for status in ("Timeout", "RE"):
+        if status in outputs:
+            return status
+    merged = []
+    offset = 0
+    for shard, output in zip(shards, outputs):
+        merged.append(relabel(output, offset))
+        offset += len(shard)
+    return "\n".join(output for output in merged if output)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a solution on a multi-case input split over parallel processes.")
+    parser.add_argument("problem_dir")
+    parser.add_argument("solution", help="C++ solution file")
+    parser.add_argument("--input", default="full_in.txt", help="input file inside problem_dir")
+    parser.add_argument("--shards", type=int, default=None, help="defaults to the number of cores")
+    parser.add_argument("--timeout", type=int, default=60)
+    args = parser.parse_args(argv)
+
+    name = os.path.basename(os.path.normpath(args.problem_dir))
+    if name not in CASE_PARSERS:
+        parser.error(f"no case parser for {name!r}")
+    with open(args.solution, "r") as f:
+        code = f.read()
+
+    problem = Problem.from_dir(args.problem_dir)
+    filename = os.path.join(tempfile.gettempdir(), f"shard_{os.getpid()}")
+    try:
+        output = run_sharded(problem, code, os.path.join(args.problem_dir, args.input), CASE_PARSERS[name],
+                             filename=filename, num_shards=args.shards, timeout=args.timeout)
+    finally:
+        problem.cleanup()
+    print(output)
+    return 1 if output in ("Timeout", "RE") else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
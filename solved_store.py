@@ -0,0 +1,114 @@
+import json
+import math
+import os
+import time
+from collections import Counter
+
+from dedup import normalize
+
+# On-disk store of solved problems (statement, accepted plan and code, verdict stats) with a
+# TF-IDF index over the statements, used to warm-start planning with related solutions.
+# Document frequencies also count a fixed reference corpus (the statements under
+# REFERENCE_DIR), so that words every contest statement uses get a low weight even while
+# the store holds a single record.
+
+REFERENCE_DIR = "Hacker cup"
+
+STOP_WORDS = frozenset("""
+a an and are as at be but by can each for from has have he her his how if in into is it its
+no not of on one or she so such than that the their them then there these they this to two was
+we were what when which who will with you your all any may must only other same some do does
+case cases input output print test tests line lines first second next following number numbers
+integer integers given value values contains containing denote denotes respectively sample
+""".split())
+
+
+class SolvedStore:
+    def __init__(self, path: str = "runs/solved.jsonl", reference_dir: str = REFERENCE_DIR) -> None:
+        self.path = path
+        self.records = []
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.records = [json.loads(line) for line in f if line.strip()]
+        self.reference = []
+        if reference_dir and os.path.isdir(reference_dir):
+            for name in sorted(os.listdir(reference_dir)):
+                statement_file = os.path.join(reference_dir, name, "statement.txt")
+                if os.path.exists(statement_file):
+                    with open(statement_file, "r", encoding="utf-8") as f:
+                        self.reference.append(self._terms(f.read()))
+        self._build_index()
+
+    def _build_index(self):
+        self.vectors = []
+        document_frequency = Counter()
+        term_counts = [self._terms(record["statement"]) for record in self.records]
+        documents = term_counts + self.reference
+        for counts in documents:
+            document_frequency.update(counts.keys())
+        self.idf = {term: math.log((1 + len(documents)) / (1 + df)) + 1 for term, df in document_frequency.items()}
+        self.vectors = [self._vector(counts) for counts in term_counts]
+
+    @staticmethod
+    def _terms(statement: str) -> Counter:
+        # the constraints and input/output format sections are near identical boilerplate across problems
+        words = normalize(statement.split("Constraints")[0]).split()
+        return Counter(word for word in words if word.isalpha() and len(word) > 1 and word not in STOP_WORDS)
+
+    def _vector(self, counts: Counter) -> dict:
+        vector = {term: (1 + math.log(count)) * self.idf.get(term, 0.0) for term, count in counts.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+        return {term: value / norm for term, value in vector.items()}
+
+    def add(self, name: str, statement: str, plan: str, code: str, score: float, iterations: int, **stats):
+        record = {
+            "name": name,
+            "statement": statement,
+            "plan": str(plan),
+            "code": code,
+            "score": score,
+            "iterations": iterations,
+            "time": time.time(),
+            **stats,
+        }
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        self.records.append(record)
+        self._build_index()
+        return record
+
+    def retrieve(self, statement: str, k: int = 2, min_similarity: float = 0.3, exclude: str = None):
+        '''
+        top-k solved problems by TF-IDF cosine similarity of the statements, as (similarity, record)
+        '''
+        query = self._vector(self._terms(statement))
+        scored = []
+        # newest first, so the stable sort below keeps the latest record of a problem
+        for record, vector in reversed(list(zip(self.records, self.vectors))):
+            if record["score"] < 1.0 or record["name"] == exclude:
+                continue
+            similarity = sum(value * vector.get(term, 0.0) for term, value in query.items())
+            if similarity >= min_similarity:
+                scored.append((similarity, record))
+        scored.sort(key=lambda item: -item[0])
+        seen = set()
+        results = []
+        for similarity, record in scored:
+            if record["name"] not in seen:
+                seen.add(record["name"])
+                results.append((similarity, record))
+        return results[:k]
+
+    def guidelines(self, statement: str, k: int = 2, max_chars: int = 1500, **kwargs) -> str:
+        '''
+        compact guidelines built from the plans of related solved problems, "" if there are none
+        '''
+        parts = []
+        for similarity, record in self.retrieve(statement, k=k, **kwargs):
+            summary = record["statement"].split("Constraints")[0].strip()[:400]
+            plan = record["plan"][:max_chars]
+            parts.append(f"A related problem (similarity {similarity:.2f}) was solved before.\nProblem: {summary}\nAccepted plan: {plan}")
+        if not parts:
+            return ""
+        return "Use these solved problems only if their ideas fit this problem:\n\n" + "\n\n".join(parts) + "\n"
@@ -1,9 +1,13 @@
 import dspy
+import runlog
 from dspy import InputField, OutputField, Signature
+
+logger = runlog.setup(__name__)
+
 def extract_code(response: str) -> str:
     # extract all text between <code> and </code> tags
     # there might be multiple code blocks, return the first one
-    print(response)
+    runlog.event(logger, "extract_code", response=response)
     import re
     code_blocks = re.findall(r'<code>(.*?)</code>', response, re.DOTALL)
     out =  code_blocks[-1] if code_blocks else ""
@@ -93,6 +97,7 @@ class IsTimeEfficientSignature(Signature):
         If N = 1e5 or 100,000, then O(N^2) is 1 second.
         There might be more than one variable, in that case you should multiply the constraints.
         Take these into consideration and the problem statement to determine if the solution is efficient.
+        If the time complexity contains a MEASURED section, it comes from actually running the program: trust it over any estimate.
         Severely discourage solutions that are more than O(N)
         EXPONENTIAL AND FACTORIAL ARE VERY VERY VERY BAD!!! CHange approach immediately.
     """
@@ -115,10 +120,23 @@ class Plan2TimeComplexityGuidelineGenerator(dspy.Module):
         self.time_complexity = dspy.ChainOfThought("natural_language_of_problem_plan_is_solving, problem_description -> time_complexity")
         self.is_time_efficient = IsTimeEfficient()
         self.generate_time_complexity_guideline = dspy.ChainOfThought("plan, problem_description, is_time_efficient -> time_complexity_guideline")  
+        self.generate_measured_time_complexity_guideline = dspy.ChainOfThought("plan, problem_description, measured_complexity, is_time_efficient -> time_complexity_guideline")
 
-    def forward(self, plan):
+    def forward(self, plan, measured_complexity: str = ""):
         time_complexity = self.time_complexity(natural_language_of_problem_plan_is_solving=plan, problem_description=self.desc)
+        if measured_complexity:
+            # measurements of the compiled program (see complexity.py) override the guessed Big-O
+            time_complexity = f"{time_complexity}\n{measured_complexity}"
         is_time_efficient = self.is_time_efficient(time_complexity=time_complexity, problem_description=self.desc)
+        if measured_complexity:
+            return dspy.Prediction(
+                time_complexity_guideline=self.generate_measured_time_complexity_guideline(
+                    plan=plan,
+                    problem_description=self.desc,
+                    measured_complexity=measured_complexity,
+                    is_time_efficient=is_time_efficient
+                )
+            )
         return dspy.Prediction(
             time_complexity_guideline=self.generate_time_complexity_guideline(
                 plan=plan, 
@@ -236,11 +254,12 @@ class Desc2PlanGenerator(dspy.Module):
         super().__init__()
         self.generate_plan = dspy.Predict(Desc2PlanSignature)
 
-    def forward(self, problem_description, guidelines):
+    def forward(self, problem_description, guidelines, config=None):
         plan = (
             self.generate_plan(
                 problem_description=problem_description,
-                guidelines=guidelines
+                guidelines=guidelines,
+                config=config or {}
             ).plan
         )
 
@@ -1,9 +1,14 @@
 import dspy
+import runlog
+from patching import PatchError, apply_edits
 from dspy import InputField, OutputField, Signature
+
+logger = runlog.setup(__name__)
+
 def extract_code(response: str) -> str:
     # extract all text between <code> and </code> tags
     # there might be multiple code blocks, return the first one
-    print(response)
+    runlog.event(logger, "extract_code", response=response)
     import re
     code_blocks = re.findall(r'<code>(.*?)</code>', response, re.DOTALL)
     out =  code_blocks[-1] if code_blocks else ""
@@ -116,17 +121,63 @@ class ReviseCodeSignature(Signature):
 
     fixed_code: str = OutputField(format=str)
     
+class ReviseCodeDiffSignature(Signature):
+    """You are an expert debugger. Your task is take c++ code and a plan and error messages which could include compilation errors or failed testcases or timeouts and fix the code.
+
+    Do NOT rewrite the whole program. Only output the edits needed to fix it, as one or more blocks of the form:
+    <<<<<<< SEARCH
+    exact lines copied from broken_code
+    =======
+    replacement lines
+    >>>>>>> REPLACE
+
+    Note:
+    * Every SEARCH part must match exactly one place in broken_code, include a few unchanged lines if needed to make it unique.
+    * Keep the edits as small as possible.
+    * USE VERBOSE VARIABLE NAMES.
+    * Use time efficient functions and data structures.
+    """
+
+    plan: str = InputField(format=str)
+    broken_code: str = InputField(format=str)
+    error: str = InputField(format=str)
+    input_output_format = InputField(format=str)
+
+    edits: str = OutputField(format=str)
+
 class ReviseCode(dspy.Module):
-    def __init__(self):
+    '''
+    mode="diff" asks for search/replace edits against broken_code and applies them locally,
+    falling back to regenerating the full program when the edits don't apply
+    '''
+    def __init__(self, mode: str = "full"):
         super().__init__()
+        self.mode = mode
         self.fix_code =  dspy.Predict(ReviseCodeSignature)
+        self.fix_code_diff = dspy.Predict(ReviseCodeDiffSignature)
+
+    def forward(self, plan, broken_code, error, input_output_format, config=None):
+        if self.mode == "diff" and broken_code.strip():
+            edits = self.fix_code_diff(
+                plan=plan,
+                broken_code=broken_code,
+                error=error,
+                input_output_format=input_output_format,
+                config=config or {}
+            ).edits
+            try:
+                fixed_code = apply_edits(broken_code, edits)
+                runlog.event(logger, "apply_edits", edits=edits, applied=True)
+                return fixed_code
+            except PatchError as e:
+                runlog.event(logger, "apply_edits", edits=edits, applied=False, reason=str(e))
 
-    def forward(self, plan, broken_code, error, input_output_format):
         fixed_code = extract_code(self.fix_code(
                 plan=plan, 
                 broken_code=broken_code,
                 error=error,
-                input_output_format=input_output_format
+                input_output_format=input_output_format,
+                config=config or {}
             ).fixed_code)
         return fixed_code
     
@@ -148,10 +199,11 @@ class RevisePlan(dspy.Module):
         super().__init__()
         self.fix_plan =  dspy.Predict(RevisePlanSignature)
 
-    def forward(self, plan, problem_description, error):
+    def forward(self, plan, problem_description, error, config=None):
         fixed_plan = self.fix_plan(
                 plan=plan, 
                 problem_description=problem_description,
                 error=error,
+                config=config or {}
             ).fixed_plan
         return fixed_plan
\ No newline at end of file
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import subprocess
+import tempfile
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from problem import Problem
+
+# Self-consistency on inputs without expected output (e.g. full_in.txt): run K independently
+# generated programs, hash every case of their output and pick the program that agrees with
+# the most common answers.
+
+
+def run_hashed(command: list, input_file: str, timeout: int = 60):
+    '''
+    run `command` on `input_file` and return (status, per case output hashes).
+    Output is streamed line by line, a new case starts at every "Case #" line, so the
+    full output never has to be held in memory.
+    '''
+    digests = []
+    current = None
+    with open(input_file, "r") as f:
+        process = subprocess.Popen(command, stdin=f, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        timer = threading.Timer(timeout, process.kill)
+        timer.start()
+        try:
+            for line in process.stdout:
+                line = line.strip()
+                if line.startswith("Case #"):
+                    if current is not None:
+                        digests.append(current.hexdigest())
+                    current = hashlib.sha1()
+                    label, _, line = line.partition(":")
+                    # hash the answer only; a label out of position makes the case disagree with everyone
+                    if label[len("Case #"):].strip() != str(len(digests) + 1):
+                        current.update(b"mislabeled " + label.encode("utf-8") + b"\n")
+                    line = line.strip()
+                elif current is None:
+                    continue
+                current.update(line.encode("utf-8") + b"\n")
+            process.wait()
+        finally:
+            timed_out = not timer.is_alive()
+            timer.cancel()
+    if current is not None:
+        digests.append(current.hexdigest())
+
+    if timed_out:
+        status = "Timeout"
+    elif process.returncode != 0:
+        status = "RE"
+    else:
+        status = "OK"
+    return status, digests
+
+
+def vote(problem: Problem, codes: list, input_file: str, timeout: int = 60, filename: str = "vote", max_workers: int = None):
+    '''
+    run every program in `codes` on `input_file` in parallel and cluster identical answers per case.
+    only programs that ran to completion vote, partial output of a Timeout / RE run is ignored.
+    returns a dict with the chosen program index, per case agreement (share of programs that gave the
+    winning answer) and per program status / number of cases agreeing with the plurality.
+    '''
+    def run(index):
+        executable = problem.compile_cpp(codes[index], f"{filename}_{index}")
+        if executable is None:
+            return "CE", []
+        return run_hashed([executable], input_file, timeout)
+
+    with ThreadPoolExecutor(max_workers=max_workers or min(len(codes), os.cpu_count() or 1)) as pool:
+        results = list(pool.map(run, range(len(codes))))
+
+    voters = [index for index, (status, _) in enumerate(results) if status == "OK"]
+    num_cases = max((len(results[index][1]) for index in voters), default=0)
+    agreement = []
+    support = [0] * len(codes)
+    for case in range(num_cases):
+        clusters = defaultdict(list)
+        for index in voters:
+            digests = results[index][1]
+            if case < len(digests):
+                clusters[digests[case]].append(index)
+        winners = max(clusters.values(), key=len)
+        agreement.append(len(winners) / len(codes))
+        for index in winners:
+            support[index] += 1
+
+    best = max(range(len(codes)), key=lambda index: (results[index][0] == "OK", support[index])) if codes else None
+    return {
+        "best": best,
+        "agreement": agreement,
+        "support": support,
+        "statuses": [status for status, _ in results],
+    }
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pick the plurality program on an input without expected output.")
+    parser.add_argument("problem_dir")
+    parser.add_argument("solutions", nargs="+", help="C++ solution files")
+    parser.add_argument("--input", default="full_in.txt", help="input file inside problem_dir")
+    parser.add_argument("--timeout", type=int, default=60)
+    args = parser.parse_args(argv)
+
+    codes = []
+    for solution in args.solutions:
+        with open(solution, "r") as f:
+            codes.append(f.read())
+
+    problem = Problem.from_dir(args.problem_dir)
+    filename = os.path.join(tempfile.gettempdir(), f"vote_{os.getpid()}")
+    try:
+        result = vote(problem, codes, os.path.join(args.problem_dir, args.input), timeout=args.timeout, filename=filename)
+    finally:
+        problem.cleanup()
+
+    for solution, status, support in zip(args.solutions, result["statuses"], result["support"]):
+        print(f"{status:>7}  {support:>4} cases in plurality  {solution}")
+    for case, share in enumerate(result["agreement"]):
+        if share < 1.0:
+            print(f"  Case #{case+1}: agreement {share:.2f}")
+    unanimous = sum(share == 1.0 for share in result["agreement"])
+    print(f"unanimous on {unanimous}/{len(result['agreement'])} cases")
+    print(f"best: {args.solutions[result['best']]}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())